@@ -4,15 +4,15 @@ import MetaTrader5 as mt5
 import pandas as pd 
 import json 
 from datetime import datetime, timedelta
+from collections import deque
 
 # Import Components
-from components.utils import load_config, init_mt5
-from components.live_monitor import render_live_panel
+from components.utils import load_config, init_mt5, get_db, start_deal_sync, MT5_LOCK
+from components.live_monitor import render_live_panel, MAX_DATA_POINTS
 from components.strategy_lab import render_strategy_lab
 from components.history import render_history_tab
 from components.journal import render_journal_tab 
 from components.analytics import render_analytics_tab
-from components.database import Database
 
 st.set_page_config(page_title="Algo Command", layout="wide")
 
@@ -112,7 +112,9 @@ def toggle_system_lock_and_hedge(new_state):
 
 def on_system_lock_toggle():
     new_state = st.session_state.system_lock_switch
-    if toggle_system_lock_and_hedge(new_state):
+    with MT5_LOCK: # Rare, multi-order protocol: hold the terminal for the whole sequence
+        locked_ok = toggle_system_lock_and_hedge(new_state)
+    if locked_ok:
         if new_state:
             st.toast("🚨 SYSTEM LOCKED! Hedges placed and TPs removed.")
         else:
@@ -121,25 +123,14 @@ def on_system_lock_toggle():
 # --- 1. DATABASE STATE RESTORATION ---
 if 'data_restored' not in st.session_state:
     try:
-        db = Database()
-        
-        recent_trades = db.fetch_trades(limit=200)
-        d_pnl = 0.0
-        d_trades = 0
+        db = get_db()
         
         now_local = datetime.now() + timedelta(hours=LOCAL_OFFSET)
         midnight_local = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
         
-        if recent_trades:
-            for t in recent_trades:
-                try:
-                    close_dt = pd.to_datetime(t['close_time']).to_pydatetime() + timedelta(hours=LOCAL_OFFSET)
-                    if close_dt >= midnight_local:
-                        d_pnl += float(t.get('pnl', 0.0))
-                        d_trades += 1
-                except Exception:
-                    continue
-                    
+        # Today's closed trades are an indexed integer range scan on close_time (unix epoch)
+        d_pnl, d_trades = db.fetch_pnl_since((midnight_local - timedelta(hours=LOCAL_OFFSET)).timestamp())
+
         st.session_state['daily_pnl'] = d_pnl
         st.session_state['daily_trades'] = d_trades
         
@@ -186,19 +177,19 @@ if 'data_restored' not in st.session_state:
         
         equity_clean.reverse()
         st.session_state['session_full_history'] = equity_clean.copy()
-        st.session_state['history_data'] = equity_clean[-200:] if len(equity_clean) > 200 else equity_clean.copy()
+        st.session_state['history_data'] = deque(equity_clean, maxlen=MAX_DATA_POINTS)
         
         st.session_state['data_restored'] = True
         
     except Exception as e:
         st.session_state['daily_pnl'] = 0.0
         st.session_state['daily_trades'] = 0
-        st.session_state['history_data'] = []
+        st.session_state['history_data'] = deque(maxlen=MAX_DATA_POINTS)
         st.session_state['session_full_history'] = []
 
 # --- 2. SESSION STATE INITIALIZATION ---
 if 'history_data' not in st.session_state:
-    st.session_state.history_data = []  
+    st.session_state.history_data = deque(maxlen=MAX_DATA_POINTS)
 if 'session_full_history' not in st.session_state:
     st.session_state.session_full_history = [] 
 
@@ -209,7 +200,8 @@ if 'reset_ticket_threshold' not in st.session_state:
         if init_mt5(path):
             now_local = datetime.now() + timedelta(hours=LOCAL_OFFSET)
             midnight_local = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-            history_before = mt5.history_deals_get(midnight_local - timedelta(days=7), midnight_local)
+            with MT5_LOCK:
+                history_before = mt5.history_deals_get(midnight_local - timedelta(days=7), midnight_local)
             
             if history_before and len(history_before) > 0:
                 st.session_state.reset_ticket_threshold = history_before[-1].ticket
@@ -223,8 +215,9 @@ if 'reset_ticket_threshold' not in st.session_state:
 # --- ISOLATED FRAGMENT FOR TOP KPIS ---
 @st.fragment(run_every=1)
 def render_top_kpis():
-    acc = mt5.account_info()
-    positions = mt5.positions_get()
+    with MT5_LOCK:
+        acc = mt5.account_info()
+        positions = mt5.positions_get()
     
     global_net_lots = 0.0
     global_net_count = 0
@@ -276,6 +269,7 @@ def main():
     if not init_mt5(path):
         st.error(f"Failed to connect to MT5 at {path}")
         return
+    start_deal_sync()
 
     with st.sidebar:
         st.header("Risk Management")
@@ -299,13 +293,14 @@ def main():
 
         st.header("Session Controls")
         if st.button("🔄 Reset Tracking Today", type="primary"):
-            st.session_state.history_data = []
+            st.session_state.history_data = deque(maxlen=MAX_DATA_POINTS)
             st.session_state.session_full_history = []
             st.session_state['daily_pnl'] = 0.0
             st.session_state['daily_trades'] = 0
             
             now_local = datetime.now() + timedelta(hours=LOCAL_OFFSET)
-            deals = mt5.history_deals_get(now_local - timedelta(days=7), now_local + timedelta(days=1))
+            with MT5_LOCK:
+                deals = mt5.history_deals_get(now_local - timedelta(days=7), now_local + timedelta(days=1))
             if deals and len(deals) > 0:
                 st.session_state.reset_ticket_threshold = deals[-1].ticket
             
@@ -130,7 +130,12 @@ def run_ml_brain():
     receiver_socket = context.socket(zmq.REP)
     receiver_socket.bind(f"tcp://*:{config['system']['zmq_brain_port']}")
     
-    manager_socket = context.socket(zmq.REQ)
+    # Fire-and-forget: the Manager logs the execution result itself, so no REQ/REP round-trip.
+    # IMMEDIATE + tiny HWM: with no Manager connected, signals are dropped, never queued for a stale replay
+    manager_socket = context.socket(zmq.PUSH)
+    manager_socket.setsockopt(zmq.IMMEDIATE, 1)
+    manager_socket.setsockopt(zmq.SNDHWM, 10)
+    manager_socket.setsockopt(zmq.LINGER, 0)
     manager_socket.connect(f"tcp://localhost:{config['system']['zmq_port']}")
 
     print("✅ Listening to Quantower | Connected to MT5 Manager")
@@ -176,13 +181,15 @@ def run_ml_brain():
                 "symbol": symbol,
                 "action": action,
                 "volume": volume, 
-                "extra_metrics": custom_metrics
+                "extra_metrics": custom_metrics,
+                "sent_ts": time.time() # Manager rejects signals older than MAX_SIGNAL_AGE_SEC
             }
 
-            manager_socket.send_json(trade_command)
+            try:
+                manager_socket.send_json(trade_command, flags=zmq.NOBLOCK)
+            except zmq.Again:
+                print("⚠️ Manager not connected: signal DROPPED (not queued)")
             db.insert_ml_snapshot(strategy_id, symbol, timestamp, payload, explicit_id=ml_id)
-            mt5_reply = manager_socket.recv_string()
-            print(f"MT5 Reply: {mt5_reply}")
 
     except KeyboardInterrupt:
         print("\nShutting down ML Brain.")
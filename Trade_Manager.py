@@ -6,30 +6,71 @@ import time
 import sys
 import signal
 import traceback
-from datetime import datetime
+import numpy as np
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 
 from components.database import Database
+from components import _fastjson
 
 # --- CONFIG & STATE ---
 CONFIG_FILE = "system_config.json"
 MEMORY_FILE = "trade_memory.json"
 last_config_mtime = 0
+_last_stat_ts = 0
+_STAT_TTL = 2.0  # seconds between config mtime checks
 config = {} 
+magic_map = {}          # magic_number -> strategy_id, rebuilt only on config reload
+strategy_order = []     # strategy_ids in config order (row index of the P/L breakdown)
+sorted_magics = np.empty(0, dtype=np.int64)  # strategy magics, sorted for searchsorted lookup
+magic_sorter = np.empty(0, dtype=np.int64)   # sorted position -> index into strategy_order
+strat_pl_buf = np.zeros(1)  # per-strategy P/L accumulator (+1 'Manual/Other' slot), reused every snapshot
 last_snapshot_time = 0
 SNAPSHOT_INTERVAL = 60
+MAINTENANCE_INTERVAL = 0.1
+MAX_SIGNAL_AGE_SEC = 2.0  # Signals older than this are stale market orders: reject, never fill
 
 tracked_tickets = {}
 trade_metadata = {}  
 trade_mfe_mae = {}   
+position_open_ts = {}  # ticket -> broker open time, lower bound for the pooled history query
+log_retry = {}         # ticket -> (failed DB attempts, next retry ts) for closed trades the DB refused
+MAX_LOG_ATTEMPTS = 5
+LOG_RETRY_BASE_SEC = 1.0  # backoff doubles per failed attempt: 1s, 2s, 4s, 8s
 basket_start_equity = None 
 
+# Exit-deal decoding tables (Basket Close is refined from the comment on client/expert closes)
+REASON_MAP = {
+    mt5.DEAL_REASON_CLIENT: "Manual Close",
+    mt5.DEAL_REASON_EXPERT: "Manual Close",
+    mt5.DEAL_REASON_SL: "Stop Loss",
+    mt5.DEAL_REASON_TP: "Take Profit",
+}
+_IN = mt5.DEAL_ENTRY_IN
+_OUT_SET = {mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_INOUT}
+
+# Signal hot path: MT5 constants bound once instead of a module attribute lookup per use
+_POS_BUY, _POS_SELL = mt5.POSITION_TYPE_BUY, mt5.POSITION_TYPE_SELL
+_ORDER_BUY, _ORDER_SELL = mt5.ORDER_TYPE_BUY, mt5.ORDER_TYPE_SELL
+_DEAL, _SLTP = mt5.TRADE_ACTION_DEAL, mt5.TRADE_ACTION_SLTP
+_GTC, _IOC = mt5.ORDER_TIME_GTC, mt5.ORDER_FILLING_IOC
+_DONE = mt5.TRADE_RETCODE_DONE
+_EMPTY = {}  # shared read-only default, never mutate
+
 db = Database()
 context = None
 socket = None
+shutdown_requested = False
+
+def request_shutdown(sig, frame):
+    """Signal handler only raises the flag; it can land while the main thread holds the DB lock."""
+    global shutdown_requested
+    shutdown_requested = True
 
-def graceful_shutdown(sig, frame):
+def graceful_shutdown():
     print("\nManager: 🛑 Releasing Port 5555 and MT5...")
     global socket, context
+    db.flush_equity()
     if socket:
         socket.setsockopt(zmq.LINGER, 0)
         socket.close()
@@ -38,27 +79,40 @@ def graceful_shutdown(sig, frame):
     mt5.shutdown()
     sys.exit(0)
 
-signal.signal(signal.SIGINT, graceful_shutdown)
+signal.signal(signal.SIGINT, request_shutdown)
 if os.name == 'nt':
-    signal.signal(signal.SIGBREAK, graceful_shutdown)
+    signal.signal(signal.SIGBREAK, request_shutdown)
 
 def get_file_mtime(filepath):
     if os.path.exists(filepath): return os.path.getmtime(filepath)
     return 0
 
-def load_config():
-    global last_config_mtime, config
+def load_config(force=False):
+    global last_config_mtime, config, magic_map, strategy_order, sorted_magics, magic_sorter, strat_pl_buf, _last_stat_ts
+    # Soft TTL: hot paths call this per signal / per tick, the file changes far less often.
+    # Writers pass force=True so they never save over a newer file (e.g. a fresh system_locked)
+    now = time.time()
+    if not force and config and now - _last_stat_ts < _STAT_TTL: return True
+    _last_stat_ts = now
+
     if not os.path.exists(CONFIG_FILE): return False
     
     current_mtime = get_file_mtime(CONFIG_FILE)
     if current_mtime > last_config_mtime:
         for attempt in range(5):
             try:
-                with open(CONFIG_FILE, "r") as f:
-                    new_config = json.load(f)
+                with open(CONFIG_FILE, "rb") as f:
+                    new_config = _fastjson.loads(f.read())
                     if 'system' in new_config and 'strategies' in new_config:
                         config = new_config
                         last_config_mtime = current_mtime
+                        strategies = config['strategies']
+                        magic_map = {v['magic_number']: k for k, v in strategies.items()}
+                        strategy_order = list(strategies.keys())
+                        magics = np.array([strategies[k]['magic_number'] for k in strategy_order], dtype=np.int64)
+                        magic_sorter = np.argsort(magics, kind='stable')
+                        sorted_magics = magics[magic_sorter]
+                        strat_pl_buf = np.zeros(len(strategy_order) + 1)
                         # print("Manager: Configuration Loaded.") <-- SILENCED SPAM
                         return True
             except Exception as e:
@@ -118,8 +172,6 @@ def connect_mt5():
 
 def sync_positions_on_startup():
     if not config: load_config()
-    strategies = config.get('strategies', {})
-    magic_map = {v['magic_number']: k for k, v in strategies.items()}
     positions = mt5.positions_get()
     count = 0
     if positions:
@@ -131,12 +183,12 @@ def sync_positions_on_startup():
                 count += 1
     print(f"Manager: Synced {count} existing positions.")
 
-def update_mfe_mae():
-    positions = mt5.positions_get()
+def update_mfe_mae(positions):
     if not positions: return
     for pos in positions:
         ticket = pos.ticket
         if ticket in trade_mfe_mae:
+            position_open_ts[ticket] = pos.time
             if pos.type == mt5.POSITION_TYPE_BUY:
                 current_point_dist = pos.price_current - pos.price_open
             else:
@@ -147,39 +199,76 @@ def update_mfe_mae():
             if current_point_dist < trade_mfe_mae[ticket]['mae']:
                 trade_mfe_mae[ticket]['mae'] = current_point_dist
 
-def record_equity_snapshot():
+def strategy_pl_breakdown(positions):
+    """Floating P/L (profit + swap) per strategy, accumulated into the preallocated strat_pl_buf.
+    Unknown magics land in an extra 'Manual/Other' slot."""
+    n_strat = len(strategy_order)
+    count = len(positions)
+    magics = np.fromiter((p.magic for p in positions), dtype=np.int64, count=count)
+    pls = np.fromiter((p.profit + p.swap for p in positions), dtype=np.float64, count=count)
+
+    slots = np.full(count, n_strat, dtype=np.int64)
+    if n_strat:
+        pos = np.minimum(np.searchsorted(sorted_magics, magics), n_strat - 1)
+        hit = sorted_magics[pos] == magics
+        slots[hit] = magic_sorter[pos[hit]]
+
+    strat_pl_buf.fill(0.0)
+    np.add.at(strat_pl_buf, slots, pls)
+
+    # Only turn it into a dict at the DB boundary
+    strat_pl = dict(zip(strategy_order, strat_pl_buf[:n_strat].tolist()))
+    if (slots == n_strat).any():
+        strat_pl["Manual/Other"] = float(strat_pl_buf[n_strat])
+    return strat_pl
+
+def record_equity_snapshot(positions):
+    """Writes one equity row. Callers gate it on SNAPSHOT_INTERVAL (see maintenance_tick)."""
     global last_snapshot_time
-    if time.time() - last_snapshot_time < SNAPSHOT_INTERVAL: return
     acc = mt5.account_info()
     if not acc: return
-    positions = mt5.positions_get()
     count = len(positions) if positions else 0
     
-    strategies = config.get('strategies', {})
-    magic_map = {v['magic_number']: k for k, v in strategies.items()}
-    strat_pl = {k: 0.0 for k in strategies.keys()} 
-    
-    if positions:
-        for pos in positions:
-            s_id = magic_map.get(pos.magic, "Manual/Other")
-            strat_pl[s_id] = strat_pl.get(s_id, 0.0) + pos.profit + pos.swap
+    strat_pl = strategy_pl_breakdown(positions or ())
             
     db.log_equity_snapshot(acc.balance, acc.equity, count, strat_pl)
     last_snapshot_time = time.time()
 
-def check_closed_trades():
-    live_positions = mt5.positions_get()
+def check_closed_trades(live_positions):
     if live_positions is None: return 
     live_ticket_ids = {p.ticket for p in live_positions}
-    missing_tickets = [t for t in tracked_tickets.keys() if t not in live_ticket_ids]
-    
+    now = time.time()
+    # Tickets in DB backoff are skipped entirely: no history query, no log line until their retry is due
+    missing_tickets = [t for t in tracked_tickets.keys()
+                       if t not in live_ticket_ids and log_retry.get(t, (0, 0.0))[1] <= now]
+    if not missing_tickets: return
+
+    # --- ONE POOLED HISTORY QUERY FOR THE WHOLE CLOSING BATCH ---
+    # Window starts at the oldest entry so both legs of every position come back in the same call
+    deals_by_pos = defaultdict(list)
+    known_open = [position_open_ts[t] for t in missing_tickets if t in position_open_ts]
+    if known_open:
+        from_dt = datetime.fromtimestamp(min(known_open) - 5, tz=timezone.utc)
+        to_dt = datetime.now(timezone.utc) + timedelta(days=1)
+        for d in mt5.history_deals_get(from_dt, to_dt) or ():
+            deals_by_pos[d.position_id].append(d)
+
+    records = []
+    closed_tickets = []
+    closed_lines = []
     for ticket in missing_tickets:
         strat_id = tracked_tickets[ticket]
-        deals = mt5.history_deals_get(position=ticket)
+        # Tickets restored from memory have no known open time yet -> per-ticket fallback
+        deals = deals_by_pos.get(ticket) or mt5.history_deals_get(position=ticket)
         if deals is None or len(deals) == 0: continue
             
-        entry_deal = next((d for d in deals if d.entry == mt5.DEAL_ENTRY_IN), None)
-        exit_deal = next((d for d in deals if d.entry in [mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_INOUT]), None)
+        # Single pass for both legs
+        entry_deal = exit_deal = None
+        for d in deals:
+            e = d.entry
+            if entry_deal is None and e == _IN: entry_deal = d
+            elif exit_deal is None and e in _OUT_SET: exit_deal = d
+            if entry_deal and exit_deal: break
         
         if exit_deal:
             meta = trade_metadata.get(ticket, {})
@@ -206,16 +295,11 @@ def check_closed_trades():
             else:
                 pnl_pts = open_price - exit_deal.price
 
-            reason = "Unknown"
-            if exit_deal.reason in [mt5.DEAL_REASON_CLIENT, mt5.DEAL_REASON_EXPERT]:
-                if exit_deal.comment and "Basket Close" in exit_deal.comment:
-                    reason = "Basket Close"
-                else:
-                    reason = "Manual Close"
-            elif exit_deal.reason == mt5.DEAL_REASON_SL: reason = "Stop Loss"
-            elif exit_deal.reason == mt5.DEAL_REASON_TP: reason = "Take Profit"
+            reason = REASON_MAP.get(exit_deal.reason, "Unknown")
+            if reason == "Manual Close" and exit_deal.comment and "Basket Close" in exit_deal.comment:
+                reason = "Basket Close"
 
-            print(f"💰 Closed: {strat_id} | ${net_pl:.2f} ({pnl_pts:.2f} pts) | {reason} | MFE: {mfe_val} pts / MAE: {mae_val} pts")
+            closed_lines.append(f"💰 Closed: {strat_id} | ${net_pl:.2f} ({pnl_pts:.2f} pts) | {reason} | MFE: {mfe_val} pts / MAE: {mae_val} pts")
             
             sl_mem = meta.get('sl_price_memory', 0.0)
             tp_mem = meta.get('tp_price_memory', 0.0)
@@ -227,7 +311,7 @@ def check_closed_trades():
                 "symbol": exit_deal.symbol,
                 "action": action,
                 "open_time": open_time,
-                "close_time": datetime.fromtimestamp(exit_deal.time),
+                "close_time": int(exit_deal.time), # Unix epoch: integer compares on the close_time index
                 "duration": duration,
                 "open_price": open_price,
                 "close_price": exit_deal.price,
@@ -241,23 +325,38 @@ def check_closed_trades():
                 "mfe": mfe_val,
                 "mae": mae_val
             }
-            
-            # --- FIX: ISOLATE DB ERROR AND FORCE MEMORY CLEANUP ---
-            try:
-                db.log_trade(trade_record)
-            except Exception as e:
-                if "UNIQUE" in str(e):
-                    print(f"Manager: Trade {ticket} was already logged. Skipping.")
-                else:
-                    print(f"Manager: DB Warning (Log Trade): {e}")
-            finally:
-                # Always safely delete it from RAM so we don't get stuck in a loop
-                if ticket in tracked_tickets: del tracked_tickets[ticket]
-                if ticket in trade_metadata: del trade_metadata[ticket]
-                if ticket in trade_mfe_mae: del trade_mfe_mae[ticket]
-                
-                # Immediately write the clean state to disk
-                save_trade_memory()
+            records.append(trade_record)
+            closed_tickets.append(ticket)
+
+    if not records: return
+
+    # --- ONE TRANSACTION FOR THE WHOLE CLOSING BATCH ---
+    # INSERT OR IGNORE makes a retry idempotent, so tickets stay tracked (with backoff) until the commit lands
+    if db.log_trades(records):
+        for line in closed_lines: print(line)
+        for ticket in closed_tickets: forget_ticket(ticket)
+    else:
+        given_up = []
+        for ticket in closed_tickets:
+            attempts = log_retry.get(ticket, (0, 0.0))[0] + 1
+            if attempts >= MAX_LOG_ATTEMPTS:
+                given_up.append(ticket)
+                forget_ticket(ticket)
+            else:
+                log_retry[ticket] = (attempts, now + LOG_RETRY_BASE_SEC * 2 ** (attempts - 1))
+        if given_up:
+            print(f"Manager: DB ERROR (Log Trades): gave up after {MAX_LOG_ATTEMPTS} attempts, NOT logged: {given_up}")
+        if not given_up: return
+
+    # Immediately write the clean state to disk
+    save_trade_memory()
+
+def forget_ticket(ticket):
+    tracked_tickets.pop(ticket, None)
+    trade_metadata.pop(ticket, None)
+    trade_mfe_mae.pop(ticket, None)
+    position_open_ts.pop(ticket, None)
+    log_retry.pop(ticket, None)
 
 def close_all_positions(reason="Global Basket Trigger"):
     positions = mt5.positions_get()
@@ -281,7 +380,15 @@ def close_all_positions(reason="Global Basket Trigger"):
         }
         mt5.order_send(request)
 
-def check_basket_logic():
+def save_basket_anchor(anchor):
+    """Read-modify-write of the basket anchor against the freshest config on disk."""
+    load_config(force=True)
+    config['risk_management']['active_basket_anchor_usd'] = anchor
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(config, f, indent=2)
+
+def check_basket_logic(positions):
+    """Returns True when it flattened the book, so the caller knows its positions snapshot is stale."""
     global basket_start_equity
     load_config() 
     
@@ -297,15 +404,11 @@ def check_basket_logic():
 
     acc = mt5.account_info()
     if acc is None: return
-
-    positions = mt5.positions_get()
     
     if positions is None or len(positions) == 0:
         if basket_start_equity is not None or risk.get('active_basket_anchor_usd') is not None:
             basket_start_equity = None
-            config['risk_management']['active_basket_anchor_usd'] = None
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(config, f, indent=2)
+            save_basket_anchor(None)
             print("Manager: 🧹 Basket cleared from memory and config.")
         return 
 
@@ -319,9 +422,7 @@ def check_basket_logic():
             print(f"Manager: 🔄 Resumed Active Basket. Original Anchor Equity: ${basket_start_equity:.2f}")
         else:
             basket_start_equity = current_equity
-            config['risk_management']['active_basket_anchor_usd'] = basket_start_equity
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(config, f, indent=2)
+            save_basket_anchor(basket_start_equity)
             print(f"Manager: 🎯 New Basket Started. Anchor Equity saved to config: ${basket_start_equity:.2f}")
 
     tp_limit = risk.get('basket_take_profit_usd')
@@ -332,11 +433,10 @@ def check_basket_logic():
             close_all_positions(reason="Equity Target Reached")
             
             basket_start_equity = None
-            config['risk_management']['active_basket_anchor_usd'] = None
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(config, f, indent=2)
+            save_basket_anchor(None)
+            return True
 
-def manage_grids():
+def manage_grids(positions):
     """Handles the 8-Minute Pivot, Regime Freezing, and Continuous DCA Averaging"""
     
     # 1. Check for Emergency Locks
@@ -346,8 +446,6 @@ def manage_grids():
 
     grid_cfg = config.get('risk_management', {}).get('grid_recovery')
     if not grid_cfg: return
-    
-    positions = mt5.positions_get()
     if not positions: return
     
     longs = [p for p in positions if p.type == mt5.POSITION_TYPE_BUY]
@@ -495,7 +593,28 @@ def manage_grids():
     process_basket(longs, "LONG")
     process_basket(shorts, "SHORT")
 
-def execute_trade(signal_data):
+def maintenance_tick():
+    """One fused maintenance pass: a single positions_get() feeds every task instead of one IPC call each."""
+    positions = mt5.positions_get()
+    # Decide up front: the per-strategy breakdown is only built on the 1-in-600 snapshot ticks
+    compute_breakdown = time.time() - last_snapshot_time >= SNAPSHOT_INTERVAL
+    update_mfe_mae(positions)
+    check_closed_trades(positions)
+    if check_basket_logic(positions):
+        # Basket was flattened, so grids and the snapshot need a fresh view of the book
+        positions = mt5.positions_get()
+    manage_grids(positions)
+    if compute_breakdown:
+        record_equity_snapshot(positions)
+
+def execute_trade(signal_data, recv_ts):
+    # --- STALE SIGNAL CHECK (Brain and Manager share the host clock) ---
+    # Age is taken at receipt, so time spent executing earlier signals of a burst
+    # (TP-attach retries block up to ~2 s) never counts against the ones queued behind them
+    sent_ts = signal_data.get('sent_ts')
+    if sent_ts is None or recv_ts - sent_ts > MAX_SIGNAL_AGE_SEC:
+        return f"Manager: REJECTED (Stale Signal, sent_ts={sent_ts})"
+
     load_config()
     
     # --- EMERGENCY SYSTEM LOCK CHECK ---
@@ -513,9 +632,9 @@ def execute_trade(signal_data):
     # --- CONCURRENCY HEDGE CHECK ---
     positions = mt5.positions_get(symbol=symbol)
     if positions:
-        if action == "BUY" and any(p.type == mt5.POSITION_TYPE_BUY for p in positions):
+        if action == "BUY" and any(p.type == _POS_BUY for p in positions):
             return "Manager: REJECTED (Long Basket Active)"
-        if action == "SELL" and any(p.type == mt5.POSITION_TYPE_SELL for p in positions):
+        if action == "SELL" and any(p.type == _POS_SELL for p in positions):
             return "Manager: REJECTED (Short Basket Active)"
 
     strategies = config.get('strategies', {})
@@ -526,11 +645,15 @@ def execute_trade(signal_data):
     if not settings['enabled']: return "Manager: Strategy Disabled"
     
     magic = settings['magic_number']
-    volume = round(float(signal_data.get('volume', settings['volume'])), 2)
+    # One float() per field; a missing or non-positive signal volume falls back to the strategy lot size
+    v_raw = signal_data.get('volume')
+    v = float(v_raw) if v_raw is not None else 0.0
+    volume = round(v if v > 0 else float(settings['volume']), 2)
     
-    limits = settings.get('trade_limits', {})
+    limits = settings.get('trade_limits') or _EMPTY
     sl_points = limits.get('sl_points', 0)
-    tp_points = float(signal_data.get('dynamic_tp', limits.get('tp_points', 1.0)))
+    tp_raw = signal_data.get('dynamic_tp')
+    tp_points = float(tp_raw if tp_raw is not None else limits.get('tp_points', 1.0))
     
     sym_info = mt5.symbol_info(symbol)
     tick = mt5.symbol_info_tick(symbol)
@@ -543,24 +666,24 @@ def execute_trade(signal_data):
     def norm_price(raw_p):
         return round(round(raw_p / tick_size) * tick_size, digits)
     
-    order_type = mt5.ORDER_TYPE_BUY if action == "BUY" else mt5.ORDER_TYPE_SELL
+    order_type = _ORDER_BUY if action == "BUY" else _ORDER_SELL
     price = tick.ask if action == "BUY" else tick.bid
     
     # 1. Send the initial order WITHOUT SL or TP
     request = {
-        "action": mt5.TRADE_ACTION_DEAL,
+        "action": _DEAL,
         "symbol": symbol,
         "volume": volume,
         "type": order_type,
         "price": price,
         "magic": magic,
         "comment": strat_id,
-        "type_time": mt5.ORDER_TIME_GTC,
-        "type_filling": mt5.ORDER_FILLING_IOC,
+        "type_time": _GTC,
+        "type_filling": _IOC,
     }
 
     result = mt5.order_send(request)
-    if result.retcode != mt5.TRADE_RETCODE_DONE: 
+    if result.retcode != _DONE: 
         return f"Manager: Failed ({result.comment})"
     
     # --- 2. THE UPGRADED BULDOZER RETRY LOOP ---
@@ -591,7 +714,7 @@ def execute_trade(signal_data):
 
         if sl_price > 0 or tp_price > 0:
             mod_request = {
-                "action": mt5.TRADE_ACTION_SLTP,
+                "action": _SLTP,
                 "position": result.order,
                 "symbol": symbol,
                 "sl": sl_price,
@@ -599,7 +722,7 @@ def execute_trade(signal_data):
             }
             mod_result = mt5.order_send(mod_request)
             
-            if mod_result.retcode == mt5.TRADE_RETCODE_DONE:
+            if mod_result.retcode == _DONE:
                 print(f"🎯 TP Successfully Anchored to {tp_price} (Attempt {attempt+1})")
                 tp_anchored = True
                 break
@@ -612,19 +735,19 @@ def execute_trade(signal_data):
                     
                     if action == "BUY" and tp_price > 0 and tick_now.bid >= (tp_price - min_dist):
                         print(f"🚀 PROXIMITY PROFIT: Closing immediately.")
-                        mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "position": result.order, "symbol": symbol, "volume": pos_check[0].volume, "type": mt5.ORDER_TYPE_SELL, "price": tick_now.bid, "magic": magic, "comment": "Proximity TP Close"})
+                        mt5.order_send({"action": _DEAL, "position": result.order, "symbol": symbol, "volume": pos_check[0].volume, "type": _ORDER_SELL, "price": tick_now.bid, "magic": magic, "comment": "Proximity TP Close"})
                         tp_anchored = True
                         break
                         
                     elif action == "SELL" and tp_price > 0 and tick_now.ask <= (tp_price + min_dist):
                         print(f"🚀 PROXIMITY PROFIT: Closing immediately.")
-                        mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "position": result.order, "symbol": symbol, "volume": pos_check[0].volume, "type": mt5.ORDER_TYPE_BUY, "price": tick_now.ask, "magic": magic, "comment": "Proximity TP Close"})
+                        mt5.order_send({"action": _DEAL, "position": result.order, "symbol": symbol, "volume": pos_check[0].volume, "type": _ORDER_BUY, "price": tick_now.ask, "magic": magic, "comment": "Proximity TP Close"})
                         tp_anchored = True
                         break
                         
                     elif sl_price > 0 and ((action == "BUY" and tick_now.bid <= (sl_price + min_dist)) or (action == "SELL" and tick_now.ask >= (sl_price - min_dist))):
                         print(f"💥 PROXIMITY STOP: Closing immediately to protect equity.")
-                        mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "position": result.order, "symbol": symbol, "volume": pos_check[0].volume, "type": mt5.ORDER_TYPE_SELL if action == "BUY" else mt5.ORDER_TYPE_BUY, "price": tick_now.bid if action == "BUY" else tick_now.ask, "magic": magic, "comment": "Proximity SL Close"})
+                        mt5.order_send({"action": _DEAL, "position": result.order, "symbol": symbol, "volume": pos_check[0].volume, "type": _ORDER_SELL if action == "BUY" else _ORDER_BUY, "price": tick_now.bid if action == "BUY" else tick_now.ask, "magic": magic, "comment": "Proximity SL Close"})
                         tp_anchored = True
                         break
                         
@@ -654,14 +777,16 @@ def run_manager():
     zmq_port = sys_conf.get('zmq_port', 5555)
 
     context = zmq.Context()
-    socket = context.socket(zmq.REP)
+    socket = context.socket(zmq.PULL)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
+    socket.setsockopt(zmq.TCP_KEEPALIVE_IDLE, 30)
     try: 
         socket.bind(f"tcp://*:{zmq_port}")
     except zmq.ZMQError as e:
         print(f"CRITICAL: Port {zmq_port} is busy.")
         return
 
-    socket.setsockopt(zmq.RCVTIMEO, 100) 
     if not connect_mt5(): return
     print(f"--- Manager Listening on Port {zmq_port} ---")
     
@@ -669,26 +794,38 @@ def run_manager():
     load_trade_memory()
     sync_positions_on_startup()
 
-    while True:
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+
+    # poll() sleeps until a signal arrives or the next maintenance tick is due
+    next_tick_ts = 0.0
+
+    while not shutdown_requested:
         try:
-            try:
-                msg = socket.recv_json(flags=zmq.NOBLOCK)
-                resp = execute_trade(msg)
-                socket.send_string(resp)
-            except zmq.Again:
-                pass
-
-            update_mfe_mae() 
-            check_closed_trades()
-            check_basket_logic()
-            manage_grids() 
-            record_equity_snapshot()
-            time.sleep(0.01)
+            timeout_ms = int(max(0.0, next_tick_ts - time.time()) * 1000)
+            socks = dict(poller.poll(timeout_ms))
+
+            if socket in socks:
+                # Drain the whole burst first, stamping each on receipt: poll(0) checks for more without raising zmq.Again
+                burst = []
+                while True:
+                    burst.append((_fastjson.loads(socket.recv()), time.time()))
+                    if not socket.poll(0, zmq.POLLIN): break
+                for msg, recv_ts in burst:
+                    print(execute_trade(msg, recv_ts))
+
+            if time.time() >= next_tick_ts:
+                # Advance first so a failing tick can't spin the loop at full speed
+                next_tick_ts = time.time() + MAINTENANCE_INTERVAL
+                maintenance_tick()
 
         except KeyboardInterrupt: 
-            graceful_shutdown(None, None)
+            break
         except Exception: 
             traceback.print_exc()
 
+    # Clean exit path: no DB call is in flight here, so the equity buffer can flush safely
+    graceful_shutdown()
+
 if __name__ == "__main__":
     run_manager()
\ No newline at end of file
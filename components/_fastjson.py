@@ -0,0 +1,17 @@
+try:
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    # orjson is optional: stdlib json is slower but produces the same payloads
+    import json
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps(obj):
+        return json.dumps(obj)
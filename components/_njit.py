@@ -0,0 +1,10 @@
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional: fall back to the plain Python function so callers don't need to care
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        def decorator(func):
+            return func
+        return decorator
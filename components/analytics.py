@@ -3,44 +3,53 @@ import pandas as pd
 import plotly.express as px
 import json
 import os
-from components.database import Database
+from components.utils import get_db
+
+# --- CACHED DATA LAYER: widget clicks rerun the script, not the pandas work ---
+@st.cache_data(ttl=30)
+def _load_trades_df():
+    return get_db().fetch_trades_df(limit=5000) # Get lots of history
+
+@st.cache_data(ttl=30)
+def _aggregate(cache_key):
+    """Daily / weekday / hourly / per-strategy rollups, already grouped by SQLite. cache_key = (row count, newest close)."""
+    db = get_db()
+    
+    daily_stats = pd.DataFrame(db.fetch_daily_pnl(), columns=['Day', 'pnl', 'Cumulative'])
+    daily_stats['Day'] = pd.to_datetime(daily_stats['Day'])
+
+    weekday_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+    day_stats = pd.DataFrame(db.fetch_weekday_pnl(), columns=['weekday', 'pnl'])
+    day_stats['Weekday'] = day_stats['weekday'].map(lambda d: weekday_names[int(d)])
+    day_stats = day_stats.set_index('Weekday')['pnl'].reindex(day_order).reset_index()
+
+    hour_stats = pd.DataFrame(db.fetch_hourly_pnl(), columns=['Hour', 'pnl'])
+
+    strat_perf = pd.DataFrame(db.fetch_strategy_perf(), columns=['strategy_id', 'pnl', 'ticket', 'duration_sec'])
+    strat_perf['Avg Profit per Trade'] = strat_perf['pnl'] / strat_perf['ticket']
+
+    return daily_stats, day_stats, hour_stats, strat_perf
 
 def render_analytics_tab():
     st.header("📊 Deep Performance Analytics")
     
-    db = Database()
-    trades = db.fetch_trades(limit=5000) # Get lots of history
+    db = get_db()
+    
+    # --- 1. DATA PREPARATION ---
+    df = _load_trades_df()
     
-    if not trades:
+    if df.empty:
         st.info("No data available.")
         return
 
-    df = pd.DataFrame(trades)
-    
-    # --- 1. DATA PREPARATION ---
-    # Convert string timestamps to datetime objects
-    df['close_time'] = pd.to_datetime(df['close_time'])
-    df['open_time'] = pd.to_datetime(df['open_time'])
-    
-    # Expand JSON Data (Unpack the meta metrics so we can analyze confidence)
-    if 'meta_json' in df.columns:
-        meta_list = df['meta_json'].tolist()
-        meta_df = pd.json_normalize(meta_list)
-        df = pd.concat([df.drop('meta_json', axis=1), meta_df], axis=1)
-    
-    # Extract "Features" for Filtering
-    df['Day'] = df['close_time'].dt.date
-    df['Weekday'] = df['close_time'].dt.day_name()
-    df['Hour'] = df['close_time'].dt.hour
+    daily_stats, day_stats, hour_stats, strat_perf = _aggregate((len(df), df['close_time'].max()))
     
     # --- 2. AGGREGATE STATS (Daily/Weekly) ---
     c1, c2 = st.columns(2)
     
     with c1:
         st.subheader("📆 Daily Performance")
-        daily_stats = df.groupby('Day')['pnl'].sum().reset_index()
-        daily_stats['Cumulative'] = daily_stats['pnl'].cumsum()
-        
         fig_daily = px.bar(daily_stats, x='Day', y='pnl', 
                            color='pnl', color_continuous_scale=['red', 'green'])
         st.plotly_chart(fig_daily, use_container_width=True)
@@ -59,15 +68,11 @@ def render_analytics_tab():
     col_a, col_b = st.columns(2)
     
     with col_a:
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-        day_stats = df.groupby('Weekday')['pnl'].sum().reindex(day_order).reset_index()
-        
         fig_day = px.bar(day_stats, x='Weekday', y='pnl', title="PnL by Weekday",
                          color='pnl', color_continuous_scale='RdYlGn')
         st.plotly_chart(fig_day, use_container_width=True)
         
     with col_b:
-        hour_stats = df.groupby('Hour')['pnl'].sum().reset_index()
         fig_hour = px.bar(hour_stats, x='Hour', y='pnl', title="PnL by Hour of Day",
                           color='pnl', color_continuous_scale='RdYlGn')
         st.plotly_chart(fig_hour, use_container_width=True)
@@ -75,14 +80,6 @@ def render_analytics_tab():
     # --- 4. STRATEGY COMPARISON ---
     st.divider()
     st.subheader("🤖 Strategy Comparison")
-    
-    strat_perf = df.groupby('strategy_id').agg({
-        'pnl': 'sum',
-        'ticket': 'count',
-        'duration_sec': 'mean'
-    }).reset_index()
-    
-    strat_perf['Avg Profit per Trade'] = strat_perf['pnl'] / strat_perf['ticket']
     st.dataframe(strat_perf.style.background_gradient(subset=['pnl'], cmap='RdYlGn'), use_container_width=True)
 
     # --- 5. ORACLE REGIME MATRIX ---
@@ -4,15 +4,25 @@ import numpy as np
 import plotly.graph_objects as go
 from streamlit_lightweight_charts import renderLightweightCharts
 
-def safe_float(val):
-    """Ensures value is a valid float for JSON (no NaN or Inf)"""
-    try:
-        f_val = float(val)
-        if pd.isna(f_val) or np.isinf(f_val):
-            return 0.0
-        return f_val
-    except:
-        return 0.0
+def safe_float_array(df, col):
+    """Column as a float array that is valid for JSON (missing column, NaN, Inf or junk -> 0.0)"""
+    if col not in df.columns:
+        return np.zeros(len(df))
+    vals = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+    return np.nan_to_num(vals, nan=0.0, posinf=0.0, neginf=0.0)
+
+def to_series_data(df, col):
+    """Lightweight-charts payload [{"time": .., "value": ..}] built by pandas (df must have no NaN time_unix)"""
+    payload = pd.DataFrame({"time": df['time_unix'].astype('int64').to_numpy(), "value": safe_float_array(df, col)})
+    return payload.to_dict('records')
+
+def chronological(df_live):
+    """Strict time order without duplicates; append-only snapshot streams skip the sort entirely"""
+    if not df_live['time_unix'].is_monotonic_increasing:
+        df_live = df_live.sort_values('time_unix')
+    if not df_live['time_unix'].is_unique:
+        df_live = df_live.drop_duplicates(subset=['time_unix'], keep='last')
+    return df_live
 
 # --- NEW: Downsampler to prevent charting lag ---
 def decimate_dataframe(df, max_points=400):
@@ -34,24 +44,14 @@ def render_equity_chart(df_live, key=None):
 
     # 1. Format Data for the Library
     # FIX: Force strict chronological order and remove exact duplicates to stop the flickering
-    df_live = df_live.sort_values('time_unix').drop_duplicates(subset=['time_unix'], keep='last')
+    df_live = chronological(df_live)
     
     # Decimate large datasets before rendering
     df_live = decimate_dataframe(df_live, max_points=400)
     
-    data_equity = []
-    data_balance = []
-    
-    for _, row in df_live.iterrows():
-        if pd.isna(row['time_unix']): continue
-        
-        t = int(row['time_unix']) 
-        
-        eq_val = safe_float(row.get('Equity'))
-        bal_val = safe_float(row.get('Balance'))
-        
-        data_equity.append({"time": t, "value": eq_val})
-        data_balance.append({"time": t, "value": bal_val})
+    df_live = df_live.dropna(subset=['time_unix'])
+    data_equity = to_series_data(df_live, 'Equity')
+    data_balance = to_series_data(df_live, 'Balance')
 
     # 2. Define Chart Options (Styling)
     chartOptions = {
@@ -112,19 +112,17 @@ def render_drawdown_chart(df_live, key=None):
         return
 
     # FIX: Force strict chronological order
-    df_live = df_live.sort_values('time_unix').drop_duplicates(subset=['time_unix'], keep='last')
+    df_live = chronological(df_live)
     df_live = decimate_dataframe(df_live, max_points=200)
     
     pl_cols = [c for c in df_live.columns if c.startswith("PL_")]
     series_list = []
     colors = ['#2962FF', '#E91E63', '#00E676', '#FFD600', '#AB47BC']
     
+    df_live = df_live.dropna(subset=['time_unix'])
+    
     for i, col in enumerate(pl_cols):
-        data_series = []
-        for _, row in df_live.iterrows():
-            if pd.isna(row['time_unix']): continue
-            val = safe_float(row.get(col))
-            data_series.append({"time": int(row['time_unix']), "value": val})
+        data_series = to_series_data(df_live, col)
         
         strat_name = col.replace("PL_", "")
         color = colors[i % len(colors)]
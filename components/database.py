@@ -1,186 +1,313 @@
 import sqlite3
-import json
 import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
 from datetime import datetime
 
+from components import _fastjson
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_FILE = os.path.join(BASE_DIR, "trading_system.db")
 SCHEMA_FILE = os.path.join(BASE_DIR, "components", "schema.sql")
+SCHEMA_VERSION = 2
+
+INSERT_TRADE_SQL = """
+    INSERT OR IGNORE INTO trades (
+        ticket, ml_feature_id, strategy_id, symbol, action, 
+        open_time, close_time, duration_sec, open_price, close_price, 
+        sl, tp, pnl, pnl_points, commission, swap, close_reason, mfe, mae
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_EQUITY_SQL = """
+    INSERT INTO equity_history (timestamp, balance, equity, open_positions, strategy_performance)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+DEAL_COLUMNS = ('ticket', 'position_id', 'time', 'entry', 'type', 'magic', 'symbol', 'volume', 'profit', 'swap', 'commission')
+INSERT_DEAL_SQL = f"INSERT OR IGNORE INTO mt5_deals ({', '.join(DEAL_COLUMNS)}) VALUES ({', '.join('?' * len(DEAL_COLUMNS))})"
+
+# EQUITY WRITE-COALESCING: ONE executemany + COMMIT PER FLUSH INSTEAD OF PER SNAPSHOT
+EQUITY_FLUSH_ROWS = 50
+EQUITY_FLUSH_SEC = 120
+
+def trade_row(trade_data):
+    """Maps a Trade Manager trade record onto the INSERT_TRADE_SQL parameter order."""
+    return (
+        trade_data['ticket'], trade_data.get('ml_feature_id'), trade_data['strategy_id'],
+        trade_data['symbol'], trade_data['action'], trade_data['open_time'],
+        trade_data['close_time'], trade_data['duration'], trade_data['open_price'],
+        trade_data['close_price'], trade_data['sl'], trade_data['tp'], trade_data['net_pnl'],
+        trade_data['pnl_points'], trade_data['commission'], trade_data['swap'],
+        trade_data['reason'], trade_data.get('mfe', 0.0), trade_data.get('mae', 0.0)
+    )
+
+def feature_metrics(features_json):
+    """Flattens one ml_features payload into the meta columns the journal/analytics tabs filter on."""
+    feat = _fastjson.loads(features_json)
+    trigger = feat.get('trigger', {})
+    context = feat.get('context', {})
+    ai_dec = feat.get('ai_decision', {})
+    return {
+        'speed': trigger.get('speed_delta'),
+        'absorption': trigger.get('absorption_ratio'),
+        'vwap_dist': context.get('vwap_dist_pct'),
+        'confidence': ai_dec.get('confidence', 0.0) * 100,
+    }
 
 class Database:
     def __init__(self):
-        self.conn = None
+        # ONE LONG-LIVED CONNECTION: PAGE CACHE STAYS WARM, NO CONNECT/CLOSE PER CALL
+        self.lock = threading.Lock()
+        self.conn = self.get_connection()
+        self._equity_buffer = deque()
+        self._last_equity_flush = time.time()
         self.initialize()
 
     def get_connection(self):
-        conn = sqlite3.connect(DB_FILE, timeout=15.0, check_same_thread=False)
+        # SQL TEXT IS THE STATEMENT-CACHE KEY: HOT INSERTS USE THE MODULE CONSTANTS ABOVE
+        conn = sqlite3.connect(DB_FILE, timeout=15.0, check_same_thread=False, cached_statements=256)
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA cache_size=-64000;")
+        conn.execute("PRAGMA busy_timeout=5000;")
+        conn.execute("PRAGMA mmap_size=268435456;")
         conn.row_factory = sqlite3.Row
         return conn
 
     def initialize(self):
         if not os.path.exists(SCHEMA_FILE): return
         with open(SCHEMA_FILE, 'r') as f: schema_script = f.read()
-        conn = self.get_connection()
-        c = conn.cursor()
-        try:
-            c.executescript(schema_script)
-            try: c.execute("SELECT strategy_performance FROM equity_history LIMIT 1")
-            except sqlite3.OperationalError: c.execute("ALTER TABLE equity_history ADD COLUMN strategy_performance TEXT")
-            conn.commit()
-        except Exception as e: print(f"DB Init Error: {e}")
-        finally: conn.close()
+        with self.lock:
+            c = self.conn.cursor()
+            try:
+                c.executescript(schema_script)
+                # MIGRATIONS ARE GATED ON user_version: THE COLUMN CHECK RUNS ONCE PER DB FILE, NOT PER STARTUP
+                version = c.execute("PRAGMA user_version").fetchone()[0]
+                if version < 1:
+                    equity_cols = {row[1] for row in c.execute("PRAGMA table_info(equity_history)")}
+                    if 'strategy_performance' not in equity_cols:
+                        c.execute("ALTER TABLE equity_history ADD COLUMN strategy_performance TEXT")
+                if version < 2:
+                    # close_time: local-time TEXT -> INTEGER unix epoch ('utc' undoes the old datetime.fromtimestamp)
+                    c.execute("UPDATE trades SET close_time = CAST(strftime('%s', close_time, 'utc') AS INTEGER) WHERE typeof(close_time) = 'text'")
+                if version < SCHEMA_VERSION:
+                    c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self.conn.commit()
+            except Exception as e: print(f"DB Init Error: {e}")
 
     def insert_ml_snapshot(self, strategy_id, symbol, timestamp_ms, payload, explicit_id=None):
-        conn = self.get_connection()
-        try:
-            c = conn.cursor()
-            json_str = json.dumps(payload)
-            
-            if explicit_id:
-                c.execute("""
-                    INSERT OR IGNORE INTO ml_features (id, strategy_id, symbol, timestamp, features_json)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (explicit_id, strategy_id, symbol, timestamp_ms, json_str))
-                inserted_id = explicit_id
-            else:
-                c.execute("""
-                    INSERT INTO ml_features (strategy_id, symbol, timestamp, features_json)
-                    VALUES (?, ?, ?, ?)
-                """, (strategy_id, symbol, timestamp_ms, json_str))
-                inserted_id = c.lastrowid
+        with self.lock:
+            try:
+                c = self.conn.cursor()
+                json_str = _fastjson.dumps(payload)
                 
-            conn.commit()
-            return inserted_id
-        except Exception as e:
-            print(f"Database Error (Insert ML): {e}")
-            return None
-        finally:
-            conn.close() # GUARANTEED TO UNLOCK DB
+                if explicit_id:
+                    c.execute("""
+                        INSERT OR IGNORE INTO ml_features (id, strategy_id, symbol, timestamp, features_json)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, (explicit_id, strategy_id, symbol, timestamp_ms, json_str))
+                    inserted_id = explicit_id
+                else:
+                    c.execute("""
+                        INSERT INTO ml_features (strategy_id, symbol, timestamp, features_json)
+                        VALUES (?, ?, ?, ?)
+                    """, (strategy_id, symbol, timestamp_ms, json_str))
+                    inserted_id = c.lastrowid
+                    
+                self.conn.commit()
+                return inserted_id
+            except Exception as e:
+                self.conn.rollback() # NEVER LEAVE THE SHARED CONNECTION MID-TRANSACTION
+                print(f"Database Error (Insert ML): {e}")
+                return None
 
     def log_trade(self, trade_data):
-        conn = self.get_connection()
-        try:
-            c = conn.cursor()
-            # USE INSERT OR IGNORE TO NATIVELY BYPASS UNIQUE GHOST TICKETS
-            c.execute("""
-                INSERT OR IGNORE INTO trades (
-                    ticket, ml_feature_id, strategy_id, symbol, action, 
-                    open_time, close_time, duration_sec, open_price, close_price, 
-                    sl, tp, pnl, pnl_points, commission, swap, close_reason, mfe, mae
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                trade_data['ticket'], trade_data.get('ml_feature_id'), trade_data['strategy_id'],
-                trade_data['symbol'], trade_data['action'], trade_data['open_time'],
-                trade_data['close_time'], trade_data['duration'], trade_data['open_price'],
-                trade_data['close_price'], trade_data['sl'], trade_data['tp'], trade_data['net_pnl'],
-                trade_data['pnl_points'], trade_data['commission'], trade_data['swap'],
-                trade_data['reason'], trade_data.get('mfe', 0.0), trade_data.get('mae', 0.0)
-            ))
-            conn.commit()
-        except Exception as e:
-            print(f"Database Error (Log Trade): {e}")
-        finally:
-            conn.close() # GUARANTEED TO UNLOCK DB
+        return self.log_trades([trade_data])
+
+    def log_trades(self, trades):
+        """Logs any iterable of closed trades in ONE transaction (one executemany, one commit).
+        Returns True only once the commit succeeded."""
+        rows = [trade_row(t) for t in trades]
+        if not rows: return True
+        with self.lock:
+            try:
+                # USE INSERT OR IGNORE TO NATIVELY BYPASS UNIQUE GHOST TICKETS
+                self.conn.executemany(INSERT_TRADE_SQL, rows)
+                self.conn.commit()
+                return True
+            except Exception as e:
+                self.conn.rollback()
+                print(f"Database Error (Log Trades): {e}")
+                return False
+
+    def log_deals(self, deals):
+        """Mirrors MT5 TradeDeal tuples into mt5_deals. Deals are immutable, so re-synced tickets are ignored."""
+        rows = [tuple(getattr(d, col) for col in DEAL_COLUMNS) for d in deals]
+        if not rows: return True
+        with self.lock:
+            try:
+                self.conn.executemany(INSERT_DEAL_SQL, rows)
+                self.conn.commit()
+                return True
+            except Exception as e:
+                self.conn.rollback()
+                print(f"Database Error (Log Deals): {e}")
+                return False
 
     def log_equity_snapshot(self, balance, equity, open_positions, strategy_pl_dict):
-        conn = self.get_connection()
+        """Buffers one equity row; flushes once EQUITY_FLUSH_ROWS rows or EQUITY_FLUSH_SEC seconds have piled up."""
+        strat_json = _fastjson.dumps(strategy_pl_dict)
+        self._equity_buffer.append((datetime.now(), balance, equity, open_positions, strat_json))
+        if len(self._equity_buffer) >= EQUITY_FLUSH_ROWS or time.time() - self._last_equity_flush >= EQUITY_FLUSH_SEC:
+            self.flush_equity()
+
+    def flush_equity(self):
+        if not self._equity_buffer: return
+        with self.lock:
+            rows = list(self._equity_buffer)
+            try:
+                self.conn.executemany(INSERT_EQUITY_SQL, rows)
+                self.conn.commit()
+                self._equity_buffer.clear()
+                self._last_equity_flush = time.time()
+            except Exception as e:
+                # KEEP THE ROWS BUFFERED: THE NEXT SNAPSHOT RETRIES THE WHOLE BATCH
+                self.conn.rollback()
+                print(f"Database Error (Log Equity): {e}")
+
+    def _trades_query(self, limit, strategy_ids=None, close_reasons=None):
+        query = '''
+            SELECT t.*, m.features_json 
+            FROM trades t
+            LEFT JOIN ml_features m ON t.ml_feature_id = m.id
+        '''
+        clauses, params = [], []
+        if strategy_ids:
+            clauses.append(f"t.strategy_id IN ({','.join('?' * len(strategy_ids))})")
+            params.extend(strategy_ids)
+        if close_reasons:
+            clauses.append(f"t.close_reason IN ({','.join('?' * len(close_reasons))})")
+            params.extend(close_reasons)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY t.close_time DESC LIMIT ?"
+        params.append(limit)
+        return query, params
+
+    def fetch_trades_df(self, limit=1000, strategy_ids=None, close_reasons=None):
+        """Newest trades first, built by pd.read_sql_query (columnar, no per-row dicts).
+        strategy_ids / close_reasons are pushed into the SQL WHERE (None = no filter)."""
+        query, params = self._trades_query(limit, strategy_ids=strategy_ids, close_reasons=close_reasons)
         try:
-            c = conn.cursor()
-            strat_json = json.dumps(strategy_pl_dict)
-            c.execute("""
-                INSERT INTO equity_history (timestamp, balance, equity, open_positions, strategy_performance)
-                VALUES (?, ?, ?, ?, ?)
-            """, (datetime.now(), balance, equity, open_positions, strat_json))
-            conn.commit()
+            with self.lock:
+                df = pd.read_sql_query(query, self.conn, params=params)
         except Exception as e:
-            print(f"Database Error (Log Equity): {e}")
-        finally:
-            conn.close() # GUARANTEED TO UNLOCK DB
+            print(f"Fetch Error: {e}")
+            return pd.DataFrame()
 
-    def fetch_recent_trades_with_features(self, limit=50, strategy_id=None):
-        conn = self.get_connection()
+        # Both times leave here as datetime64 in local wall-clock: close_time is stored as unix epoch,
+        # open_time as the legacy local-time TEXT (feature_backfiller parses it)
+        df['close_time'] = pd.to_datetime(df['close_time'].map(datetime.fromtimestamp, na_action='ignore'))
+        df['open_time'] = pd.to_datetime(df['open_time'])
+
+        # Only rows with an ML payload get meta columns; the rest join as NaN
+        features = df.pop('features_json').fillna('')
+        has_features = features != ''
+        if has_features.any():
+            meta = pd.DataFrame([feature_metrics(f) for f in features[has_features]], index=features.index[has_features])
+            df = df.join(meta)
+        return df
+
+    def fetch_pnl_since(self, since_ts):
+        """(net pnl, trade count) for trades closed at or after the unix timestamp since_ts."""
+        rows = self._fetch_rows(
+            "SELECT COALESCE(SUM(pnl), 0.0) AS pnl, COUNT(*) AS trades FROM trades WHERE close_time >= ?",
+            (int(since_ts),), label="fetch_pnl_since"
+        )
+        return (rows[0]['pnl'], rows[0]['trades']) if rows else (0.0, 0)
+
+    def fetch_trade_filter_options(self):
+        """Distinct strategy_id and close_reason values, for filter widgets that must list options before fetching rows."""
+        strategies = [r['strategy_id'] for r in self._fetch_rows("SELECT DISTINCT strategy_id FROM trades", label="fetch_trade_filter_options")]
+        reasons = [r['close_reason'] for r in self._fetch_rows("SELECT DISTINCT close_reason FROM trades", label="fetch_trade_filter_options")]
+        return strategies, reasons
+
+    # --- PRE-AGGREGATED ANALYTICS (SQLite does the GROUP BY, Python only plots) ---
+    def _fetch_rows(self, query, params=(), label="fetch"):
         try:
-            c = conn.cursor()
-            
-            query = '''
-                SELECT t.*, m.features_json 
-                FROM trades t
-                LEFT JOIN ml_features m ON t.ml_feature_id = m.id
-            '''
-            params = []
-            if strategy_id:
-                query += " WHERE t.strategy_id = ?"
-                params.append(strategy_id)
-            query += " ORDER BY t.close_time DESC LIMIT ?"
-            params.append(limit)
-            
-            c.execute(query, params)
-            rows = c.fetchall()
-            results = []
-            
-            for row in rows:
-                d = dict(row)
-                pseudo_meta = {}
-                
-                if d.get('features_json'):
-                    feat = json.loads(d['features_json'])
-                    trigger = feat.get('trigger', {})
-                    context = feat.get('context', {})
-                    ai_dec = feat.get('ai_decision', {})
-                    
-                    pseudo_meta['speed'] = trigger.get('speed_delta')
-                    pseudo_meta['absorption'] = trigger.get('absorption_ratio')
-                    pseudo_meta['vwap_dist'] = context.get('vwap_dist_pct')
-                    pseudo_meta['confidence'] = ai_dec.get('confidence', 0.0) * 100 
-                
-                d['meta_json'] = pseudo_meta
-                if 'features_json' in d: del d['features_json']
-                results.append(d)
-                
-            return results
-        except Exception as e: 
-            print(f"Fetch Error: {e}")
+            with self.lock:
+                rows = self.conn.execute(query, params).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"DB Error ({label}): {e}")
             return []
-        finally:
-            conn.close()
 
-    def fetch_trades(self, limit=1000):
-        return self.fetch_recent_trades_with_features(limit=limit)
+    def fetch_daily_pnl(self):
+        return self._fetch_rows("""
+            SELECT date(close_time, 'unixepoch', 'localtime') AS Day, SUM(pnl) AS pnl,
+                   SUM(SUM(pnl)) OVER (ORDER BY date(close_time, 'unixepoch', 'localtime')) AS Cumulative
+            FROM trades GROUP BY Day ORDER BY Day
+        """, label="fetch_daily_pnl")
+
+    def fetch_weekday_pnl(self):
+        # strftime('%w'): 0 = Sunday ... 6 = Saturday
+        return self._fetch_rows("""
+            SELECT CAST(strftime('%w', close_time, 'unixepoch', 'localtime') AS INTEGER) AS weekday, SUM(pnl) AS pnl
+            FROM trades GROUP BY weekday
+        """, label="fetch_weekday_pnl")
+
+    def fetch_hourly_pnl(self):
+        return self._fetch_rows("""
+            SELECT CAST(strftime('%H', close_time, 'unixepoch', 'localtime') AS INTEGER) AS Hour, SUM(pnl) AS pnl
+            FROM trades GROUP BY Hour ORDER BY Hour
+        """, label="fetch_hourly_pnl")
+
+    def fetch_strategy_perf(self):
+        return self._fetch_rows("""
+            SELECT strategy_id, SUM(pnl) AS pnl, COUNT(ticket) AS ticket, AVG(duration_sec) AS duration_sec
+            FROM trades GROUP BY strategy_id
+        """, label="fetch_strategy_perf")
+
+    def fetch_last_deal_time(self):
+        rows = self._fetch_rows("SELECT MAX(time) AS last_time FROM mt5_deals", label="fetch_last_deal_time")
+        return rows[0]['last_time'] if rows else None
+
+    def fetch_deals_df(self, since_ts):
+        """Mirrored MT5 deals with time >= since_ts (MT5 epoch seconds), oldest first."""
+        try:
+            with self.lock:
+                return pd.read_sql_query("SELECT * FROM mt5_deals WHERE time >= ? ORDER BY time", self.conn, params=(int(since_ts),))
+        except Exception as e:
+            print(f"DB Error (fetch_deals_df): {e}")
+            return pd.DataFrame(columns=DEAL_COLUMNS)
 
     def fetch_equity_history(self, limit=2880):
-        conn = self.get_connection()
         try:
-            c = conn.cursor()
-            c.execute("SELECT * FROM equity_history ORDER BY timestamp DESC LIMIT ?", (limit,))
-            return c.fetchall()
+            with self.lock:
+                return self.conn.execute("SELECT * FROM equity_history ORDER BY timestamp DESC LIMIT ?", (limit,)).fetchall()
         except Exception as e:
             print(f"DB Error (fetch_equity_history): {e}")
             return []
-        finally:
-            conn.close()
 
     def log_regime(self, timestamp, regime, name):
-        conn = self.get_connection()
-        try:
-            c = conn.cursor()
-            c.execute("INSERT INTO regime_history VALUES (?, ?, ?)", (timestamp, regime, name))
-            conn.commit()
-        except Exception as e:
-            print(f"Database Error (Log Regime): {e}")
-        finally:
-            conn.close()
+        with self.lock:
+            try:
+                self.conn.execute("INSERT INTO regime_history VALUES (?, ?, ?)", (timestamp, regime, name))
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                print(f"Database Error (Log Regime): {e}")
 
     def fetch_regimes(self, limit=300):
-        conn = self.get_connection()
         try:
-            c = conn.cursor()
-            c.execute("SELECT * FROM regime_history ORDER BY timestamp DESC LIMIT ?", (limit,))
-            rows = c.fetchall()
+            with self.lock:
+                rows = self.conn.execute("SELECT * FROM regime_history ORDER BY timestamp DESC LIMIT ?", (limit,)).fetchall()
             return [dict(row) for row in rows]
         except Exception as e:
             print(f"DB Error (fetch_regimes): {e}")
             return []
-        finally:
-            conn.close()
\ No newline at end of file
@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import MetaTrader5 as mt5
 from datetime import datetime, timedelta
+from components.utils import get_magic_map, get_db
 
 def render_history_tab(strategies):
     st.subheader("Historic Analysis")
@@ -11,16 +11,15 @@ def render_history_tab(strategies):
     
     # We apply the same Reset Filter here so 'History' tab matches the session view?
     # Usually History tab ignores reset and shows full history. Let's show FULL history here.
-    history = mt5.history_deals_get(from_date, datetime.now() + timedelta(days=1))
+    # Served from the SQLite deal mirror (see utils.start_deal_sync) instead of a terminal round-trip
+    df_hist = get_db().fetch_deals_df(from_date.timestamp())
     
-    if history and len(history) > 0:
-        df_hist = pd.DataFrame(list(history), columns=history[0]._asdict().keys())
+    if not df_hist.empty:
         df_deals = df_hist[df_hist['entry'] == 1].copy()
         
         if not df_deals.empty:
             df_deals['time'] = pd.to_datetime(df_deals['time'], unit='s')
-            magic_map = {v['magic_number']: k for k, v in strategies.items()}
-            df_deals['Strategy'] = df_deals['magic'].map(magic_map).fillna("Unknown")
+            df_deals['Strategy'] = df_deals['magic'].map(get_magic_map(strategies)).fillna("Unknown")
             
             summary = df_deals.groupby('Strategy').agg({
                 'profit': 'sum',
@@ -1,37 +1,50 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
+from matplotlib import colormaps
 from pandas.api.types import is_numeric_dtype
-from components.database import Database
+from components.utils import get_db
+
+PNL_CMAP = colormaps['RdYlGn'] # Resolved once, not per render
+
+def pnl_gradient(col, vmin=-10, vmax=10):
+    """Same cells as Styler.background_gradient(cmap='RdYlGn'), built from one colormap call for the whole column."""
+    vals = col.to_numpy(dtype=float)
+    rgb = PNL_CMAP(np.clip((vals - vmin) / (vmax - vmin), 0, 1))[:, :3]
+    # Text colour follows pandas' relative-luminance threshold so labels stay readable
+    lin = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    dark = lin @ np.array([0.2126, 0.7152, 0.0722]) < 0.408
+    hexes = np.rint(rgb * 255).astype(int)
+    return [
+        '' if np.isnan(v) else f"background-color: #{r:02x}{g:02x}{b:02x}; color: {'#f1f1f1' if d else '#000000'};"
+        for v, (r, g, b), d in zip(vals, hexes, dark)
+    ]
 
 def render_journal_tab():
     st.header("🗄️ Trade Database (SQLite)")
     
-    db = Database()
-    trades = db.fetch_trades(limit=1000)
+    db = get_db()
+    strategies, reasons = db.fetch_trade_filter_options()
     
-    if not trades:
+    if not strategies:
         st.info("Database is empty. Waiting for closed trades...")
         return
 
-    # 1. Load Data
-    df = pd.DataFrame(trades)
-    
-    # 2. Expand JSON Data (The "Unpacking" Magic)
-    # This turns {"momentum": 15} into a real column named "momentum"
-    if 'meta_json' in df.columns:
-        meta_list = df['meta_json'].tolist()
-        meta_df = pd.json_normalize(meta_list)
-        df = pd.concat([df.drop('meta_json', axis=1), meta_df], axis=1)
-
     # --- STANDARD FILTERS ---
     with st.expander("🔎 Filter Options", expanded=True):
         c1, c2, c3 = st.columns(3)
         with c1:
-            strategies = list(df['strategy_id'].unique())
             sel_strat = st.multiselect("Strategy", strategies, default=strategies)
         with c2:
-            reasons = list(df['close_reason'].unique())
             sel_reason = st.multiselect("Exit Reason", reasons, default=reasons)
+
+        # 1. Load Data: strategy / reason filters run as SQL WHERE clauses, so only matching rows are read
+        # (empty or full selection = no filter; meta metrics like "confidence" arrive as flat columns)
+        df = db.fetch_trades_df(
+            limit=1000,
+            strategy_ids=sel_strat if 0 < len(sel_strat) < len(strategies) else None,
+            close_reasons=sel_reason if 0 < len(sel_reason) < len(reasons) else None
+        )
+
         with c3:
             # Date Filter (Optional implementation)
             st.caption(f"Showing last {len(df)} trades")
@@ -67,23 +80,21 @@ def render_journal_tab():
                             # Apply the filter instantly
                             df = df[(df[col] >= user_range[0]) & (df[col] <= user_range[1])]
 
-    # Apply Standard Filters
-    if sel_strat:
-        df = df[df['strategy_id'].isin(sel_strat)]
-    if sel_reason:
-        df = df[df['close_reason'].isin(sel_reason)]
-
     # --- METRICS ROW ---
     if not df.empty:
-        total_pnl = df['pnl'].sum()
-        win_count = len(df[df['pnl'] > 0])
-        win_rate = (win_count / len(df)) * 100 if len(df) > 0 else 0
+        # The rows are already loaded, so sum them here rather than re-running the query as an aggregate
+        pnl = df['pnl'].to_numpy()
+        total_pnl = pnl.sum()
+        win_count = int((pnl > 0).sum())
+        trade_count = len(df)
+        avg_duration = df['duration_sec'].mean()
+        win_rate = (win_count / trade_count) * 100 if trade_count > 0 else 0
         
         m1, m2, m3, m4 = st.columns(4)
         m1.metric("Total PnL", f"${total_pnl:,.2f}")
         m2.metric("Win Rate", f"{win_rate:.1f}%")
-        m3.metric("Trade Count", len(df))
-        m4.metric("Avg Duration", f"{df['duration_sec'].mean():.1f}s")
+        m3.metric("Trade Count", trade_count)
+        m4.metric("Avg Duration", f"{avg_duration:.1f}s")
 
         # --- DATA TABLE ---
         # Define column order: Ticket -> Strategy -> PnL -> Custom Metrics -> The rest
@@ -97,7 +108,7 @@ def render_journal_tab():
         valid_cols = [c for c in final_cols if c in df.columns]
 
         st.dataframe(
-            df[valid_cols].style.background_gradient(subset=['pnl'], cmap='RdYlGn', vmin=-10, vmax=10),
+            df[valid_cols].style.apply(pnl_gradient, subset=['pnl']),
             use_container_width=True,
             hide_index=True
         )
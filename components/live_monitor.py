@@ -7,7 +7,7 @@ import sqlite3
 import time
 from datetime import datetime, timedelta
 from components.charts import render_equity_chart, render_drawdown_chart, render_regime_chart
-from components.utils import get_strategy_name
+from components.utils import get_db, MT5_LOCK
 
 MAX_DATA_POINTS = 200
 
@@ -18,37 +18,34 @@ def render_live_panel(strategies, config):
     local_offset = config.get('system', {}).get('local_utc_offset_hours', 1)
     broker_offset = config.get('system', {}).get('broker_utc_offset_hours', 3)
     
-    # --- DATA COLLECTION ---
-    acc = mt5.account_info()
-    if not acc: return
+    # --- MT5 SYMBOL MAPPING FOR THE REGIME CHART ---
+    qt_symbol = config.get('strategies', {}).get('QT_Velocity', {}).get('symbol', 'ES.M26')
+    symbol_map = config.get('system', {}).get('symbol_mapping', {})
+    mt5_symbol = symbol_map.get(qt_symbol, qt_symbol)
 
-    positions = mt5.positions_get()
+    # --- DATA COLLECTION (one locked burst of terminal calls, see utils.MT5_LOCK) ---
+    with MT5_LOCK:
+        acc = mt5.account_info()
+        if not acc: return
+        positions = mt5.positions_get()
+        rates = mt5.copy_rates_from_pos(mt5_symbol, mt5.TIMEFRAME_M1, 0, 100)
 
-    strat_live_data = {
-        name: {
-            'floating': 0.0, 
-            'open_lots': 0.0, 
-            'open_count': 0,
-            'net_lots': 0.0, 
-            'net_count': 0
-        } for name in strategies.keys()
-    }
-    
+    # --- PER-STRATEGY EXPOSURE: one positions DataFrame, one groupby pass over magic ---
+    live = pd.DataFrame(columns=['floating', 'open_lots', 'open_count', 'net_lots', 'net_count'])
     if positions:
-        for pos in positions:
-            strat_name = get_strategy_name(pos.magic, strategies)
-            
-            if strat_name in strat_live_data:
-                strat_live_data[strat_name]['floating'] += (pos.profit + pos.swap)
-                strat_live_data[strat_name]['open_lots'] += pos.volume
-                strat_live_data[strat_name]['open_count'] += 1
-                
-                if pos.type == mt5.POSITION_TYPE_BUY:
-                    strat_live_data[strat_name]['net_lots'] += pos.volume
-                    strat_live_data[strat_name]['net_count'] += 1
-                elif pos.type == mt5.POSITION_TYPE_SELL:
-                    strat_live_data[strat_name]['net_lots'] -= pos.volume
-                    strat_live_data[strat_name]['net_count'] -= 1
+        pos_df = pd.DataFrame(list(positions), columns=positions[0]._asdict().keys())
+        side = np.where(pos_df['type'] == mt5.POSITION_TYPE_BUY, 1, np.where(pos_df['type'] == mt5.POSITION_TYPE_SELL, -1, 0))
+        live = pos_df.assign(
+            floating=pos_df['profit'] + pos_df['swap'], side=side, signed_vol=side * pos_df['volume']
+        ).groupby('magic').agg(
+            floating=('floating', 'sum'), open_lots=('volume', 'sum'), open_count=('volume', 'size'),
+            net_lots=('signed_vol', 'sum'), net_count=('side', 'sum')
+        )
+
+    # One row per configured strategy (foreign magics are not on the scorecard); feeds snapshot + scorecard
+    live = live.reindex([data['magic_number'] for data in strategies.values()], fill_value=0)
+    live.index = list(strategies.keys())
+    strat_live_data = live.to_dict('index')
 
     # --- SAVE SNAPSHOT (FIXED TIMEZONE LOGIC) ---
     # 1. Grab the absolute, unambiguous UNIX epoch for the chart's X-axis
@@ -68,9 +65,8 @@ def render_live_panel(strategies, config):
     for name, data in strat_live_data.items():
         snapshot[f"PL_{name}"] = data['floating']
 
+    # history_data is a deque(maxlen=MAX_DATA_POINTS): O(1) append, oldest point evicted automatically
     st.session_state.history_data.append(snapshot)
-    if len(st.session_state.history_data) > MAX_DATA_POINTS:
-        st.session_state.history_data.pop(0)
 
     st.session_state.session_full_history.append(snapshot)
 
@@ -143,14 +139,6 @@ def render_live_panel(strategies, config):
             
     with c2:
         st.subheader("Live Market Regime (SPX)")
-        qt_symbol = config.get('strategies', {}).get('QT_Velocity', {}).get('symbol', 'ES.M26')
-        
-        # --- APPLY THE MT5 SYMBOL MAPPING ---
-        symbol_map = config.get('system', {}).get('symbol_mapping', {})
-        mt5_symbol = symbol_map.get(qt_symbol, qt_symbol)
-        
-        rates = mt5.copy_rates_from_pos(mt5_symbol, mt5.TIMEFRAME_M1, 0, 100)
-        
         if rates is not None and len(rates) > 0:
             df_rates = pd.DataFrame(rates)
             
@@ -211,43 +199,35 @@ def render_live_panel(strategies, config):
     # --- SCORECARD TABLE ---
     st.subheader("Strategy Scorecard (Session)")
     
-    # We fetch deals from -3 days to capture active overnight sessions
-    from_date = datetime.utcnow() - timedelta(days=3)
-    to_date = datetime.utcnow() + timedelta(days=1)
-    history = mt5.history_deals_get(from_date, to_date)
+    # We read deals from -3 days to capture active overnight sessions (mirrored into SQLite by the deal sync thread)
+    df_deals = get_db().fetch_deals_df(time.time() - 3 * 86400)
     
-    position_magic_map = {}
-    if history:
-        for d in history:
-            if d.entry == 0: 
-                position_magic_map[d.position_id] = d.magic
+    # ONE GROUPBY PASS OVER ALL DEALS -> {magic: {'realized', 'trades', 'wins'}}
+    stats_by_magic = {}
+    if not df_deals.empty:
+        opens = df_deals[df_deals['entry'] == 0]
+        position_magic_map = dict(zip(opens['position_id'], opens['magic']))
+
+        # Filter strictly for closing deals that happened after the session threshold
+        closed = df_deals[df_deals['entry'].isin([1, 2]) & (df_deals['ticket'] > st.session_state.get('reset_ticket_threshold', 0))]
+        if not closed.empty:
+            stats_by_magic = pd.DataFrame({
+                'magic': closed['position_id'].map(position_magic_map).fillna(closed['magic']).astype('int64'),
+                'net': closed['profit'] + closed['swap'] + closed['commission'],
+                'win': closed['profit'] > 0,
+            }).groupby('magic').agg(realized=('net', 'sum'), trades=('net', 'size'), wins=('win', 'sum')).to_dict('index')
 
     scorecard_data = []
     
     for name, data in strategies.items():
-        target_magic = data['magic_number']
-        
-        realized_pl = 0.0
-        trades_count = 0
-        wins = 0
-        
-        if history:
-            deals = []
-            for d in history:
-                # Filter strictly for closing deals that happened after the session threshold
-                if d.entry in [1, 2] and d.ticket > st.session_state.get('reset_ticket_threshold', 0):
-                    original_magic = position_magic_map.get(d.position_id, d.magic)
-                    if original_magic == target_magic:
-                        deals.append(d)
-
-            trades_count = len(deals)
-            realized_pl = sum(d.profit + d.swap + d.commission for d in deals)
-            wins = sum(1 for d in deals if d.profit > 0)
+        magic_stats = stats_by_magic.get(data['magic_number'], {})
+        realized_pl = float(magic_stats.get('realized', 0.0))
+        trades_count = int(magic_stats.get('trades', 0))
+        wins = int(magic_stats.get('wins', 0))
         
         win_rate = (wins / trades_count * 100) if trades_count > 0 else 0
         
-        default_stats = {'floating': 0.0, 'open_lots': 0.0, 'open_count': 0, 'net_lots': 0.0, 'net_count': 0}
-        live_stats = strat_live_data.get(name, default_stats)
+        live_stats = strat_live_data[name] # Reindexed to every configured strategy above
         
         net_money = realized_pl + live_stats['floating']
         
@@ -270,12 +250,10 @@ def render_live_panel(strategies, config):
         
     df_score = pd.DataFrame(scorecard_data)
     
-    def color_pnl(val):
-        if isinstance(val, str):
-            if "$-" in val: return 'color: #ff4b4b'
-            elif "$0.00" in val: return 'color: white'
-            else: return 'color: #2bd67b'
-        return ''
+    def color_pnl(col):
+        # Whole-column string ops instead of a Python call per cell
+        return np.where(col.str.contains("$-", regex=False), 'color: #ff4b4b',
+               np.where(col.str.contains("$0.00", regex=False), 'color: white', 'color: #2bd67b'))
 
-    styled_df = df_score.style.map(color_pnl, subset=["Net Money", "Floating P/L", "Banked (Session)"])
+    styled_df = df_score.style.apply(color_pnl, subset=["Net Money", "Floating P/L", "Banked (Session)"])
     st.dataframe(styled_df, use_container_width=True, hide_index=True)
\ No newline at end of file
@@ -5,7 +5,7 @@ CREATE TABLE IF NOT EXISTS trades (
     symbol TEXT,
     action TEXT,
     open_time TIMESTAMP,
-    close_time TIMESTAMP,
+    close_time INTEGER,    -- unix epoch of the exit deal
     duration_sec REAL,
     open_price REAL,
     close_price REAL,
@@ -44,4 +44,26 @@ CREATE TABLE IF NOT EXISTS regime_history (
     timestamp REAL,
     regime INTEGER,
     name TEXT
-);
\ No newline at end of file
+);
+
+-- MT5 DEAL MIRROR: synced by the dashboard's background thread so tabs read SQLite, not the terminal
+CREATE TABLE IF NOT EXISTS mt5_deals (
+    ticket INTEGER PRIMARY KEY,
+    position_id INTEGER,
+    time INTEGER,
+    entry INTEGER,
+    type INTEGER,
+    magic INTEGER,
+    symbol TEXT,
+    volume REAL,
+    profit REAL,
+    swap REAL,
+    commission REAL
+);
+
+-- HOT-PATH INDEXES: ORDER BY ... DESC LIMIT and strategy filters read the index, not the whole table
+CREATE INDEX IF NOT EXISTS idx_trades_close_time ON trades(close_time DESC);
+CREATE INDEX IF NOT EXISTS idx_trades_strategy_close ON trades(strategy_id, close_time DESC);
+CREATE INDEX IF NOT EXISTS idx_equity_ts ON equity_history(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_regime_ts ON regime_history(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_mt5_deals_time ON mt5_deals(time);
@@ -1,24 +1,68 @@
 import json
 import os
+import threading
+import time
+import traceback
 import MetaTrader5 as mt5
 import streamlit as st
+from components.database import Database
 
 CONFIG_FILE = "system_config.json"
 
+# The MetaTrader5 package talks to one terminal over a single IPC channel and is not documented as
+# thread-safe. Streamlit sessions and the deal sync thread all take this lock around every MT5 call.
+MT5_LOCK = threading.RLock()
+
+# --- MT5 DEAL MIRROR: one background thread keeps mt5_deals fresh, tabs only read SQLite ---
+DEAL_SYNC_SEC = 10
+DEAL_BACKFILL_DAYS = 30     # History tab slider maximum
+DEAL_SYNC_OVERLAP_SEC = 60  # Re-read a little behind the watermark; INSERT OR IGNORE drops repeats
+
+@st.cache_data(max_entries=1)
+def _read_config(mtime):
+    # mtime is only the cache key: the file is re-parsed only after it changes on disk
+    with open(CONFIG_FILE, "r") as f: return json.load(f)
+
 def load_config():
     if not os.path.exists(CONFIG_FILE): return {}
-    with open(CONFIG_FILE, "r") as f: return json.load(f)
+    return _read_config(os.path.getmtime(CONFIG_FILE))
 
 def save_config(new_config):
     with open(CONFIG_FILE, "w") as f:
         json.dump(new_config, f, indent=2)
+    _read_config.clear() # Don't trust mtime resolution for back-to-back saves
     st.success("Configuration Saved! (Updates apply automatically ⚡)")
 
+@st.cache_resource
+def get_db():
+    """One Database (and its persistent, lock-guarded connection) shared by every rerun and session."""
+    return Database()
+
+def _deal_sync_loop(db):
+    while True:
+        try:
+            last_time = db.fetch_last_deal_time()
+            now_ts = int(time.time())
+            from_ts = last_time - DEAL_SYNC_OVERLAP_SEC if last_time else now_ts - DEAL_BACKFILL_DAYS * 86400
+            with MT5_LOCK:
+                deals = mt5.history_deals_get(from_ts, now_ts + 86400) # +1 day: broker clock runs ahead of UTC
+            if deals: db.log_deals(deals)
+        except Exception:
+            traceback.print_exc()
+        time.sleep(DEAL_SYNC_SEC)
+
+@st.cache_resource
+def start_deal_sync():
+    """Starts the MT5 -> mt5_deals sync thread once per dashboard process (call after init_mt5)."""
+    worker = threading.Thread(target=_deal_sync_loop, args=(get_db(),), name="mt5_deal_sync", daemon=True)
+    worker.start()
+    return worker
+
 def init_mt5(path):
-    if not mt5.initialize(path=path): return False
+    with MT5_LOCK:
+        if not mt5.initialize(path=path): return False
     return True
 
-def get_strategy_name(magic, strategies):
-    for name, data in strategies.items():
-        if data['magic_number'] == magic: return name
-    return str(magic)
\ No newline at end of file
+def get_magic_map(strategies):
+    """Magic number -> strategy name. Build once per render, then O(1) .get() per position."""
+    return {data['magic_number']: name for name, data in strategies.items()}
\ No newline at end of file
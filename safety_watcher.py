@@ -2,10 +2,17 @@ import MetaTrader5 as mt5
 import json
 import time
 import os
-import collections
+import numpy as np
 import requests
 import pytz
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+
+from components._njit import njit
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 CONFIG_FILE = "system_config.json"
 
@@ -13,12 +20,106 @@ def load_config():
     with open(CONFIG_FILE, "r") as f:
         return json.load(f)
 
+def pin_process(core):
+    """Opt-in (system.cpu_affinity): pins the watcher to one core and raises its priority to cut poll-loop jitter."""
+    if core is None:
+        print("ℹ️ CPU pinning disabled (system.cpu_affinity is null).")
+        return
+    if psutil is None:
+        print(f"⚠️ cpu_affinity={core} requested but psutil is not installed (pip install psutil). Running UNPINNED.")
+        return
+    n_cores = psutil.cpu_count(logical=True) or 0
+    if not 0 <= int(core) < n_cores:
+        print(f"⚠️ cpu_affinity={core} requested but this host only has cores 0-{n_cores - 1}. Running UNPINNED.")
+        return
+    proc = psutil.Process(os.getpid())
+    try:
+        proc.cpu_affinity([int(core)])
+        if os.name == 'nt':
+            proc.nice(psutil.HIGH_PRIORITY_CLASS)
+        else:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(os.sched_get_priority_min(os.SCHED_FIFO)))
+        print(f"📌 Watcher pinned to core {core} with elevated priority.")
+    except (psutil.Error, OSError, ValueError) as e:
+        print(f"⚠️ Could not pin/prioritise watcher (core {core}): {e}")
+
 def get_daily_adr(symbol, days=14):
     rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_D1, 1, days)
     if rates is None or len(rates) == 0:
         return 0
-    total_range = sum([r['high'] - r['low'] for r in rates])
-    return total_range / len(rates)
+    return float(np.mean(rates['high'] - rates['low']))
+
+def fetch_new_ticks(symbol, last_tick_msc):
+    """Delta fetch: only the ticks that arrived after the last one we processed (empty on a quiet wire)."""
+    from_dt = datetime.fromtimestamp(last_tick_msc / 1000.0, tz=timezone.utc)
+    # Broker clock runs ahead of UTC, so give the upper bound a full day of headroom
+    to_dt = datetime.now(timezone.utc) + timedelta(days=1)
+    ticks = mt5.copy_ticks_range(symbol, from_dt, to_dt, mt5.COPY_TICKS_ALL)
+    if ticks is None or len(ticks) == 0:
+        return None
+    # copy_ticks_range works at second resolution, so drop the ones we already saw
+    ticks = ticks[ticks['time_msc'] > last_tick_msc]
+    return ticks if len(ticks) > 0 else None
+
+def seed_last_tick_msc(symbol):
+    """Broker time of the newest tick, or 0 if MT5 has none to give yet. Never the local clock."""
+    tick = mt5.symbol_info_tick(symbol)
+    if tick is not None and tick.time_msc > 0:
+        return int(tick.time_msc)
+    # Short look-back; the broker clock runs ahead of UTC so anything recent lands inside it
+    recent = mt5.copy_ticks_from(symbol, datetime.now(timezone.utc) - timedelta(hours=1), 1000, mt5.COPY_TICKS_ALL)
+    if recent is None or len(recent) == 0:
+        return 0
+    return int(recent['time_msc'][-1])
+
+def make_tick_ring(window_ms, capacity=4096):
+    """Persistent tick window kept in preallocated numpy buffers (oldest -> newest).
+    Reads are zero-copy views; old ticks are only compacted away when the buffer fills up."""
+    ring_time_ms = np.empty(capacity, dtype=np.int64)
+    ring_mid = np.empty(capacity, dtype=np.float64)
+    size = 0
+
+    def extend(time_ms, mid):
+        nonlocal ring_time_ms, ring_mid, size
+        n = len(time_ms)
+        if size + n > len(ring_time_ms):
+            # Full: slide the live window back to the front, grow only if it still doesn't fit.
+            # Keep one tick before the cutoff: it carries the price prevailing at the window start
+            start = max(int(np.searchsorted(ring_time_ms[:size], time_ms[-1] - window_ms, side='right')) - 1, 0)
+            live = size - start
+            ring_time_ms[:live] = ring_time_ms[start:size]
+            ring_mid[:live] = ring_mid[start:size]
+            size = live
+            if size + n > len(ring_time_ms):
+                new_cap = max(2 * len(ring_time_ms), size + n)
+                ring_time_ms = np.concatenate((ring_time_ms[:size], np.empty(new_cap - size, dtype=np.int64)))
+                ring_mid = np.concatenate((ring_mid[:size], np.empty(new_cap - size, dtype=np.float64)))
+        ring_time_ms[size:size + n] = time_ms
+        ring_mid[size:size + n] = mid
+        size += n
+
+    def get_buffer():
+        return ring_time_ms[:size], ring_mid[:size]
+
+    def clear():
+        nonlocal size
+        size = 0
+
+    return extend, get_buffer, clear
+
+@njit(cache=True, fastmath=True)
+def flash_crash_step(time_arr, mid_arr, window_ms, threshold):
+    """Hot-path kernel: mid-price move across the trailing window. Returns (triggered, delta).
+    The reference is the price prevailing at the window start (last tick at or before it), so a
+    single gap tick after a quiet stretch is still measured against the pre-gap price."""
+    n = time_arr.shape[0]
+    if n < 2:
+        return False, 0.0
+    idx = np.searchsorted(time_arr, time_arr[n - 1] - window_ms, side='right') - 1
+    if idx < 0:
+        idx = 0
+    delta = abs(mid_arr[n - 1] - mid_arr[idx])
+    return delta >= threshold, delta
 
 def fetch_tier1_news():
     print("🌐 Fetching latest Economic Calendar from Forex Factory...")
@@ -143,6 +244,8 @@ def run_safety_watcher():
         print("Watcher failed to connect to MT5")
         return
 
+    pin_process(config['system'].get('cpu_affinity'))
+
     # 1. Flash Crash Parameters
     symbol = config['strategies']['QT_Velocity']['symbol']
     fc_params = config['risk_management']['emergency_protocols']['flash_crash_watcher']
@@ -162,11 +265,17 @@ def run_safety_watcher():
     print(f"📊 {fc_params['adr_days']}-Day ADR: {adr:.2f} pts. | Panic Threshold: {panic_point_threshold:.2f} pts in {window_sec}s.")
 
     # State variables
-    price_history = collections.deque()
+    window_ms = int(window_sec * 1000)
+    ring_extend, get_buffer, ring_clear = make_tick_ring(window_ms)
     last_news_fetch_time = 0  # Changed from daily tracking to timestamp tracking
     NEWS_FETCH_INTERVAL_SEC = 4 * 3600  # 4 hours in seconds
     tier1_timestamps = []
 
+    # Anchor the tick delta-fetch on the broker's latest tick (0 = not anchored yet)
+    last_tick_msc = seed_last_tick_msc(symbol)
+    if last_tick_msc == 0:
+        print(f"⚠️ No broker tick for {symbol} yet. Flash crash check idle until one arrives.")
+
     while True:
         try:
             now_ts = time.time()
@@ -193,24 +302,29 @@ def run_safety_watcher():
                         break 
 
             # --- FLASH CRASH CHECK ---
-            tick = mt5.symbol_info_tick(symbol)
-            if not tick:
-                time.sleep(0.1)
+            if last_tick_msc == 0:
+                last_tick_msc = seed_last_tick_msc(symbol)
+                time.sleep(1)
                 continue
 
-            current_price = (tick.bid + tick.ask) / 2.0
-            price_history.append((now_ts, current_price))
+            # Quiet wire: nothing new since the last pass, so skip the whole window evaluation
+            new_ticks = fetch_new_ticks(symbol, last_tick_msc)
+            if new_ticks is None:
+                time.sleep(0.1)
+                continue
 
-            while price_history and now_ts - price_history[0][0] > window_sec:
-                price_history.popleft()
+            # Structured array columns are already contiguous per field; no per-record walk
+            tick_times = new_ticks['time_msc']
+            ring_extend(tick_times, (new_ticks['bid'] + new_ticks['ask']) * 0.5)
+            last_tick_msc = int(tick_times[-1])
 
-            if len(price_history) > 1:
-                oldest_price = price_history[0][1]
-                price_delta = abs(current_price - oldest_price)
+            # Window is measured on broker tick time, not the local clock
+            time_buf, mid_buf = get_buffer()
+            triggered, price_delta = flash_crash_step(time_buf, mid_buf, window_ms, panic_point_threshold)
 
-                if price_delta >= panic_point_threshold:
-                    execute_hedge_and_lock(symbol, f"Flash Crash Detected! Moved {price_delta:.2f} pts in <= {window_sec}s")
-                    price_history.clear() 
+            if triggered:
+                execute_hedge_and_lock(symbol, f"Flash Crash Detected! Moved {price_delta:.2f} pts in <= {window_sec}s")
+                ring_clear()
 
             time.sleep(0.1) 
 